@@ -1,37 +1,187 @@
 from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
 from langchain.schema import HumanMessage, SystemMessage
-from langchain.prompts import PromptTemplate
-import json
-from typing import Dict, List, Optional
+import functools
+from dataclasses import dataclass, field
+import re
+from typing import Dict, List, Optional, Union
 import os
+import numpy as np
+import orjson
 from dotenv import load_dotenv
 from mobility_tests import MOBILITY_TESTS
 from movenet_analyzer import MoveNetAnalyzer
 
 load_dotenv()
 
+# One shared chat client for the whole process: every agent reuses the
+# same underlying HTTP connection pool instead of paying a fresh TLS
+# handshake per session. Constructed lazily on first use so the API can
+# boot (and serve the static endpoints) without OPENAI_API_KEY set.
+@functools.lru_cache(maxsize=1)
+def _get_llm() -> ChatOpenAI:
+    return ChatOpenAI(
+        temperature=0,
+        model="gpt-4o-mini",
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=2,
+        request_timeout=30
+    )
+
+# Load exercises once per process; every agent instance shares the dict
+# instead of re-opening and re-parsing the file per session.
+with open('exercises.json', 'rb') as f:
+    _EXERCISES = orjson.loads(f.read())
+
+# Flat per-area test table built once from MOBILITY_TESTS, so no dict
+# construction happens on the request path.
+_TESTS_BY_AREA = {
+    area: tuple(
+        {
+            "id": f"{area}_{test_type}",
+            "name": test_info['name'],
+            "description": test_info['description'],
+            "youtube_link": test_info['youtube_link']
+        }
+        for test_type, test_info in area_tests.items()
+    )
+    for area, area_tests in MOBILITY_TESTS.items()
+}
+
+# Single compiled alternation over all pain keywords; the group name is
+# the pain area. "lower back" sits before "back" so longest-match wins.
+_PAIN_RE = re.compile(
+    r'\b(?:'
+    r'(?P<neck>necks?|cervical)'
+    r'|(?P<shoulder>shoulders?|arms?)'
+    r'|(?P<lower_back>lower back|lumbar|spines?|back(?:aches?)?)'
+    r'|(?P<knee>kneecaps?|knees?|legs?)'
+    r'|(?P<ankle>ankles?|foot|heels?)'
+    r'|(?P<jaw>jaws?|tmj|face|mouth)'
+    r')\b',
+    re.IGNORECASE
+)
+
+# Static pain-specific responses (keep them short and formatted).
+# These replace an LLM round-trip: the reply is a pure function of the
+# pain area, so there is no reason to pay ~500-2000ms per turn for it.
+_PAIN_RESPONSES = {
+    "neck": """I'm so sorry your neck hurts!
+
+• Any shoulder tightness too?
+• Past neck injuries?
+• Long hours at computer?
+
+What makes it feel worse?""",
+
+    "shoulder": """Oh no, shoulder pain is tough!
+
+• Which shoulder hurts?
+• Pain when lifting arms?
+• Any neck stiffness?
+
+When did this start?""",
+
+    "lower_back": """Lower back pain is so common!
+
+• Sharp or dull pain?
+• Worse when sitting/standing?
+• Any leg numbness?
+
+What triggered this?""",
+
+    "knee": """Knee pain can really limit you!
+
+• Which knee bothers you?
+• Pain when walking/stairs?
+• Any swelling?
+
+How long has this been happening?""",
+
+    "ankle": """Ankle pain affects everything!
+
+• Recent injury or twist?
+• Swelling or stiffness?
+• Pain when walking?
+
+What activities hurt most?""",
+
+    "jaw": """Jaw pain is so uncomfortable!
+
+• Clicking or popping?
+• Headaches too?
+• Stress or teeth grinding?
+
+When is it worst?"""
+}
+
+# Canned test-feedback strings; only the pain area varies per call, so
+# everything else is interned once at import instead of being rebuilt
+# per request.
+_NO_CAPTURE_MSG = """I couldn't capture your movement!
+
+• Make sure you're well-lit
+• Stay in camera view
+• Let's try again
+
+Don't worry, we'll get it!"""
+
+_INVALID_KEYPOINTS_MSG = """Let's try again, dear!
+
+• Camera didn't capture all data
+• Make sure whole body visible
+• Take your time
+
+We'll get this right together!"""
+
+_TEST_PASS_TEMPLATE = """Great job completing the test!
+
+• Your {area} mobility looks good
+• Keep up the movement
+
+Ready for the next test?"""
+
+_TEST_FAIL_TEMPLATE = """Test complete! I see what's happening.
+
+• Your {area} needs some work
+• We'll address this in your routine
+
+Let's continue, beautiful soul!"""
+
+_TECH_ERROR_MSG = """Technical hiccup!
+
+• Don't worry, it happens
+• Let's try again
+• I'm still here for you
+
+Ready when you are!"""
+
+@dataclass
+class AssessmentState:
+    """Per-session assessment progress with a fixed field set"""
+    session_started: bool = False
+    greeting_sent: bool = False
+    completed_tests: List[str] = field(default_factory=list)
+    problem_areas: List[str] = field(default_factory=list)
+    test_results: Dict[str, Dict] = field(default_factory=dict)
+    recommended_tests: List[Dict] = field(default_factory=list)
+    user_concerns: str = ""
+
+
 class PhysiotherapyAgent:
     def __init__(self):
-        self.llm = ChatOpenAI(
-            temperature=0.7,
-            model="gpt-3.5-turbo",
-            openai_api_key=os.getenv("OPENAI_API_KEY")
-        )
-        self.memory = ConversationBufferMemory(return_messages=True)
         self.analyzer = MoveNetAnalyzer()
-        self.assessment_state = {
-            "session_started": False,
-            "greeting_sent": False,
-            "completed_tests": [],
-            "problem_areas": [],
-            "test_results": {}
+        # Precomputed dispatch: test_type -> bound analyze_* method,
+        # so the hot path skips hasattr/getattr string lookups
+        self._dispatch = {
+            name[len('analyze_'):]: getattr(self.analyzer, name)
+            for name in dir(self.analyzer)
+            if name.startswith('analyze_') and callable(getattr(self.analyzer, name))
         }
+        self.assessment_state = AssessmentState()
         
-        # Load exercises
-        with open('exercises.json', 'r') as f:
-            self.exercises = json.load(f)
-        
+        # Exercises are parsed once at module load
+        self.exercises = _EXERCISES
+
         # Simplified system prompt for better formatting
         self.system_prompt = """You are Tara, a warm physiotherapist. Keep responses VERY SHORT (max 50 words).
 Use this EXACT format:
@@ -42,7 +192,12 @@ Use this EXACT format:
 - Closing question
 
 NEVER use paragraphs. Always use bullet points."""
-    
+
+    @property
+    def llm(self) -> ChatOpenAI:
+        """Shared chat client, constructed on first access"""
+        return _get_llm()
+
     def format_response(self, text: str) -> str:
         """Helper to ensure proper formatting"""
         # Clean up the response
@@ -68,22 +223,17 @@ NEVER use paragraphs. Always use bullet points."""
     def start_assessment(self, user_name: str = "there") -> Dict:
         """Start assessment with fixed greeting"""
         
-        if self.assessment_state["greeting_sent"]:
+        if self.assessment_state.greeting_sent:
             return {
                 "message": "I'm still here to help!\n\nWhat area is bothering you?",
                 "state": "awaiting_problem_areas"
             }
         
-        self.assessment_state["greeting_sent"] = True
-        self.assessment_state["session_started"] = True
+        self.assessment_state.greeting_sent = True
+        self.assessment_state.session_started = True
         
         greeting = "Hello beautiful soul! I'm Tara, your physiotherapist for the day.\n\n• Tell me where it hurts\n• I'm here to help you feel better\n\nWhat area is giving you trouble today?"
-        
-        self.memory.save_context(
-            {"input": f"Start assessment for {user_name}"}, 
-            {"output": greeting}
-        )
-        
+
         return {
             "message": greeting,
             "state": "awaiting_problem_areas"
@@ -92,10 +242,11 @@ NEVER use paragraphs. Always use bullet points."""
     def process_problem_areas(self, user_message: str) -> Dict:
         """Process user's problem areas with proper formatting"""
         
-        self.assessment_state["user_concerns"] = user_message
-        pain_area = self._detect_primary_pain_area(user_message.lower())
-        
-        if not pain_area:
+        self.assessment_state.user_concerns = user_message
+        # _PAIN_RE is case-insensitive, so no .lower() copy is needed
+        pain_areas = self._detect_pain_areas(user_message)
+
+        if not pain_areas:
             response = """I want to understand where you're hurting.
 
 • Neck, shoulders, or jaw?
@@ -108,12 +259,13 @@ What's bothering you most, beautiful soul?"""
                 "recommended_tests": []
             }
         
-        # Generate formatted response for specific pain area
-        response = self._generate_pain_response(pain_area, user_message)
-        
+        # Generate formatted response for the primary (first-mentioned)
+        # pain area; tests cover every area the user listed
+        response = self._generate_pain_response(pain_areas[0], user_message)
+
         # Get recommended tests
-        recommended_tests = self._get_recommended_tests([pain_area])
-        self.assessment_state["recommended_tests"] = recommended_tests
+        recommended_tests = self._get_recommended_tests(pain_areas)
+        self.assessment_state.recommended_tests = recommended_tests
         
         # Add test prompt
         test_message = "\n\nLet's do some movement tests:\n\n• These help me understand what's happening\n• Ready to start your assessment?"
@@ -122,67 +274,16 @@ What's bothering you most, beautiful soul?"""
         
         return {
             "message": full_response,
-            "recommended_tests": [self._format_test_for_frontend(test) for test in recommended_tests]
+            "recommended_tests": recommended_tests
         }
     
     def _generate_pain_response(self, pain_area: str, user_message: str) -> str:
         """Generate pain-specific response with proper formatting"""
-        
-        # Pain-specific responses (keep them short and formatted)
-        pain_responses = {
-            "neck": """I'm so sorry your neck hurts!
 
-• Any shoulder tightness too?
-• Past neck injuries?
-• Long hours at computer?
-
-What makes it feel worse?""",
-            
-            "shoulder": """Oh no, shoulder pain is tough!
-
-• Which shoulder hurts?
-• Pain when lifting arms?
-• Any neck stiffness?
-
-When did this start?""",
-            
-            "lower_back": """Lower back pain is so common!
-
-• Sharp or dull pain?
-• Worse when sitting/standing?
-• Any leg numbness?
-
-What triggered this?""",
-            
-            "knee": """Knee pain can really limit you!
-
-• Which knee bothers you?
-• Pain when walking/stairs?
-• Any swelling?
-
-How long has this been happening?""",
-            
-            "ankle": """Ankle pain affects everything!
-
-• Recent injury or twist?
-• Swelling or stiffness?
-• Pain when walking?
-
-What activities hurt most?""",
-            
-            "jaw": """Jaw pain is so uncomfortable!
-
-• Clicking or popping?
-• Headaches too?
-• Stress or teeth grinding?
-
-When is it worst?"""
-        }
-        
         # Return the specific response or generate one
-        if pain_area in pain_responses:
-            return pain_responses[pain_area]
-        
+        if pain_area in _PAIN_RESPONSES:
+            return _PAIN_RESPONSES[pain_area]
+
         # Fallback if area not found
         return f"""I understand you have {pain_area} pain.
 
@@ -192,102 +293,69 @@ When is it worst?"""
 
 Tell me more, beautiful soul."""
     
-    def _detect_primary_pain_area(self, message: str) -> Optional[str]:
-        """Detect primary pain area from user message"""
-        pain_keywords = {
-            "neck": ["neck", "cervical"],
-            "shoulder": ["shoulder", "arm"],
-            "lower_back": ["back", "lower back", "lumbar", "spine"],  
-            "knee": ["knee", "kneecap", "leg"],
-            "ankle": ["ankle", "foot", "heel"],
-            "jaw": ["jaw", "tmj", "face", "mouth"]
-        }
-        
-        for area, keywords in pain_keywords.items():
-            if any(keyword in message for keyword in keywords):
-                return area
-        
-        return None
+    def _detect_pain_areas(self, message: str) -> List[str]:
+        """Detect all mentioned pain areas, in order of first mention"""
+        areas = []
+        for m in _PAIN_RE.finditer(message):
+            if m.lastgroup not in areas:
+                areas.append(m.lastgroup)
+        return areas
     
     def _get_recommended_tests(self, pain_areas: List[str]) -> List[Dict]:
         """Get test recommendations based on pain areas"""
-        recommended = []
-        
-        for area in pain_areas:
-            if area in MOBILITY_TESTS:
-                area_tests = MOBILITY_TESTS[area]
-                for test_type, test_info in area_tests.items():
-                    test_id = f"{area}_{test_type}"
-                    recommended.append({
-                        "id": test_id,
-                        "name": test_info['name'],
-                        "description": test_info['description'],
-                        "youtube_link": test_info['youtube_link']
-                    })
-        
-        return recommended
+        # Copy each entry so a caller mutating its result can't poison
+        # the process-wide cache for every other session
+        return [dict(test) for test in _recommended_tests_for(tuple(sorted(pain_areas)))]
     
-    def _format_test_for_frontend(self, test: Dict) -> Dict:
-        """Format test recommendation for frontend"""
-        return test
-    
-    def analyze_movenet_results(self, test_id: str, keypoints: List[Dict]) -> Dict:
-        """Analyze movement test results with Tara's encouraging tone"""
+    def analyze_movenet_results(self, test_id: str, keypoints: Union[List[Dict], np.ndarray]) -> Dict:
+        """Analyze movement test results with Tara's encouraging tone
+
+        Accepts either the raw MoveNet list-of-dicts payload or an
+        already-decoded (17, 3) float32 keypoint array.
+        """
         try:
-            if not keypoints:
+            if keypoints is None or len(keypoints) == 0:
                 return {
                     "success": False,
-                    "explanation": """I couldn't capture your movement!
-
-• Make sure you're well-lit
-• Stay in camera view
-• Let's try again
-
-Don't worry, we'll get it!"""
+                    "explanation": _NO_CAPTURE_MSG
                 }
             
-            # Validate keypoints
-            for kp in keypoints:
-                if 'x' not in kp or 'y' not in kp:
+            # Validate and convert in one fused pass: a keypoint missing
+            # x/y raises from inside np.fromiter, no separate loop
+            if isinstance(keypoints, np.ndarray):
+                arr = keypoints
+            else:
+                try:
+                    arr = MoveNetAnalyzer.keypoints_to_array(keypoints)
+                except (KeyError, TypeError):
                     return {
                         "success": False,
-                        "explanation": """Let's try again, dear!
-
-• Camera didn't capture all data
-• Make sure whole body visible
-• Take your time
-
-We'll get this right together!"""
+                        "explanation": _INVALID_KEYPOINTS_MSG
                     }
-            
+            if np.isnan(arr).any():
+                return {
+                    "success": False,
+                    "explanation": _INVALID_KEYPOINTS_MSG
+                }
+
             # Analyze movement
             area, test_type = test_id.split('_', 1)
             
-            analysis_method = f"analyze_{test_type}"
-            if hasattr(self.analyzer, analysis_method):
-                raw_results = getattr(self.analyzer, analysis_method)(keypoints)
+            analysis_fn = self._dispatch.get(test_type)
+            if analysis_fn is not None:
+                raw_results = analysis_fn(arr)
             else:
                 raw_results = {"pass": True, "details": "Test completed"}
             
             # Store results
-            self.assessment_state["test_results"][test_id] = raw_results
-            self.assessment_state["completed_tests"].append(test_id)
+            self.assessment_state.test_results[test_id] = raw_results
+            self.assessment_state.completed_tests.append(test_id)
             
             # Generate simple encouraging feedback
             if raw_results.get("pass", True):
-                explanation = f"""Great job completing the test!
-
-• Your {area} mobility looks good
-• Keep up the movement
-
-Ready for the next test?"""
+                explanation = _TEST_PASS_TEMPLATE.format(area=area)
             else:
-                explanation = f"""Test complete! I see what's happening.
-
-• Your {area} needs some work
-• We'll address this in your routine
-
-Let's continue, beautiful soul!"""
+                explanation = _TEST_FAIL_TEMPLATE.format(area=area)
             
             return {
                 "success": True,
@@ -299,13 +367,7 @@ Let's continue, beautiful soul!"""
             print(f"Error analyzing movement: {e}")
             return {
                 "success": False,
-                "explanation": """Technical hiccup!
-
-• Don't worry, it happens
-• Let's try again
-• I'm still here for you
-
-Ready when you are!"""
+                "explanation": _TECH_ERROR_MSG
             }
     
     def generate_routine(self) -> Dict:
@@ -313,7 +375,7 @@ Ready when you are!"""
         
         # Analyze all test results
         problem_areas = []
-        for test_id, results in self.assessment_state["test_results"].items():
+        for test_id, results in self.assessment_state.test_results.items():
             if not results.get("pass", True):
                 area, test_type = test_id.split('_', 1)
                 problem_areas.append((area, test_type, results))
@@ -346,62 +408,82 @@ Stay consistent, you're doing amazing!"""
     
     def _generate_targeted_exercises(self, problem_areas: List) -> List[Dict]:
         """Generate exercises targeting specific problem areas"""
-        exercises = []
-        
-        # Add targeted exercises based on problem areas
-        area_exercises = {
-            "neck": {
-                "name": "Gentle Neck Stretches",
-                "duration": "3 minutes",
-                "description": "Slowly stretch in all directions",
-                "sets": "Hold 30 seconds each"
-            },
-            "shoulder": {
-                "name": "Shoulder Rolls & Stretches",
-                "duration": "4 minutes",
-                "description": "Improve shoulder mobility",
-                "sets": "10 rolls, 4 stretches"
-            },
-            "lower_back": {
-                "name": "Cat-Cow Stretches",
-                "duration": "5 minutes",
-                "description": "Mobilize your spine gently",
-                "sets": "15 repetitions"
-            },
-            "knee": {
-                "name": "Knee Strengthening",
-                "duration": "5 minutes",
-                "description": "Build knee stability",
-                "sets": "10 reps each leg"
-            },
-            "ankle": {
-                "name": "Ankle Circles & Flexes",
-                "duration": "3 minutes",
-                "description": "Improve ankle mobility",
-                "sets": "15 circles each direction"
-            },
-            "jaw": {
-                "name": "Jaw Release Exercises",
-                "duration": "3 minutes",
-                "description": "Relieve jaw tension",
-                "sets": "5 gentle stretches"
-            }
+        # The output only depends on which areas failed, so memoize on the
+        # sorted area set (test_type and raw results don't matter here).
+        # Entries are copied out for the same reason as the test cache.
+        areas = tuple(sorted({area for area, _, _ in problem_areas}))
+        return [dict(exercise) for exercise in _targeted_exercises_for(areas)]
+
+
+# Memoized helpers: both are pure functions of the area tuple, so repeat
+# turns in a session (and across sessions) reuse the same result objects
+# instead of rebuilding small dicts every call.
+
+@functools.lru_cache(maxsize=32)
+def _recommended_tests_for(pain_areas: tuple) -> tuple:
+    """Build test recommendations for a sorted tuple of pain areas"""
+    return tuple(
+        test for area in pain_areas for test in _TESTS_BY_AREA.get(area, ())
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _targeted_exercises_for(areas: tuple) -> tuple:
+    """Build the exercise list for a sorted tuple of problem areas"""
+    exercises = []
+
+    # Add targeted exercises based on problem areas
+    area_exercises = {
+        "neck": {
+            "name": "Gentle Neck Stretches",
+            "duration": "3 minutes",
+            "description": "Slowly stretch in all directions",
+            "sets": "Hold 30 seconds each"
+        },
+        "shoulder": {
+            "name": "Shoulder Rolls & Stretches",
+            "duration": "4 minutes",
+            "description": "Improve shoulder mobility",
+            "sets": "10 rolls, 4 stretches"
+        },
+        "lower_back": {
+            "name": "Cat-Cow Stretches",
+            "duration": "5 minutes",
+            "description": "Mobilize your spine gently",
+            "sets": "15 repetitions"
+        },
+        "knee": {
+            "name": "Knee Strengthening",
+            "duration": "5 minutes",
+            "description": "Build knee stability",
+            "sets": "10 reps each leg"
+        },
+        "ankle": {
+            "name": "Ankle Circles & Flexes",
+            "duration": "3 minutes",
+            "description": "Improve ankle mobility",
+            "sets": "15 circles each direction"
+        },
+        "jaw": {
+            "name": "Jaw Release Exercises",
+            "duration": "3 minutes",
+            "description": "Relieve jaw tension",
+            "sets": "5 gentle stretches"
         }
-        
-        # Add exercises for identified problem areas
-        added_areas = set()
-        for area, _, _ in problem_areas:
-            if area in area_exercises and area not in added_areas:
-                exercises.append(area_exercises[area])
-                added_areas.add(area)
-        
-        # Add general exercise if no specific problems or as addition
-        if not exercises or len(exercises) < 3:
-            exercises.append({
-                "name": "Full Body Flow",
-                "duration": "5 minutes",
-                "description": "Gentle movement for overall health",
-                "sets": "1 complete flow"
-            })
-        
-        return exercises[:3]  # Limit to 3 exercises to keep it manageable
\ No newline at end of file
+    }
+    
+    # Add exercises for identified problem areas (areas is already unique)
+    for area in areas:
+        if area in area_exercises:
+            exercises.append(area_exercises[area])
+
+    # Add general exercise if no specific problems or as addition
+    if not exercises or len(exercises) < 3:
+        exercises.append({
+            "name": "Full Body Flow",
+            "duration": "5 minutes",
+            "description": "Gentle movement for overall health",
+            "sets": "1 complete flow"
+        })
+
+    return tuple(exercises[:3])  # Limit to 3 exercises to keep it manageable
\ No newline at end of file
@@ -1,14 +1,23 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Dict, Optional, List
+import asyncio
+import base64
+import hashlib
 import uvicorn
+import numpy as np
+import orjson
+from cachetools import TTLCache
 from agent import PhysiotherapyAgent
-from mobility_tests import MOBILITY_TESTS
+from mobility_tests import MOBILITY_TESTS, TEST_INFO
 
-app = FastAPI(title="Physiotherapy Agent API")
+# orjson serializes responses in C, several times faster than stdlib
+# json, and handles numpy scalars from the analyzer natively
+app = FastAPI(title="Physiotherapy Agent API", default_response_class=ORJSONResponse)
 
-# Configure CORS
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -17,9 +26,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+# The test catalog never changes at runtime, so clients can revalidate
+# with an ETag instead of re-downloading several KB of static JSON
+_TESTS_ETAG = hashlib.md5(orjson.dumps(MOBILITY_TESTS)).hexdigest()
+_STATIC_CACHE_HEADERS = {
+    "ETag": _TESTS_ETAG,
+    "Cache-Control": "public, max-age=3600"
+}
 
-# Store sessions
-agents: Dict[str, PhysiotherapyAgent] = {}
+# Store sessions, bounded: idle sessions are evicted after an hour so
+# resident memory can't grow with every session_id ever seen. All
+# handlers are async, so access stays on the event loop thread and
+# needs no extra locking.
+agents: "TTLCache[str, PhysiotherapyAgent]" = TTLCache(maxsize=1000, ttl=3600)
 
 # Pydantic models
 class StartAssessmentRequest(BaseModel):
@@ -33,22 +54,28 @@ class ProblemAreasRequest(BaseModel):
 class MoveNetAnalysisRequest(BaseModel):
     session_id: str
     test_id: str
-    keypoints: List[Dict]  # MoveNet keypoints
+    keypoints: Optional[List[Dict]] = None  # MoveNet keypoints
+    # Compact alternative: base64-encoded float32 buffer of 17 (x, y,
+    # score) rows -- ~5x smaller than the JSON list and decoded straight
+    # into an ndarray
+    keypoints_b64: Optional[str] = None
 
 class GenerateRoutineRequest(BaseModel):
     session_id: str
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Physiotherapy Agent API is running!"}
 
 @app.get("/available_tests")
-def get_available_tests():
+async def get_available_tests(if_none_match: Optional[str] = Header(None)):
     """Get all available mobility tests"""
-    return {"tests": MOBILITY_TESTS}
+    if if_none_match == _TESTS_ETAG:
+        return Response(status_code=304)
+    return ORJSONResponse({"tests": MOBILITY_TESTS}, headers=_STATIC_CACHE_HEADERS)
 
 @app.post("/start_assessment")
-def start_assessment(request: StartAssessmentRequest):
+async def start_assessment(request: StartAssessmentRequest):
     """Initialize assessment"""
     try:
         agent = agents.get(request.session_id)
@@ -61,7 +88,7 @@ def start_assessment(request: StartAssessmentRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/submit_problem_areas")
-def submit_problem_areas(request: ProblemAreasRequest):
+async def submit_problem_areas(request: ProblemAreasRequest):
     """Process problem areas and get test recommendations"""
     if request.session_id not in agents:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -73,22 +100,32 @@ def submit_problem_areas(request: ProblemAreasRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/analyze_movement")
-def analyze_movement(request: MoveNetAnalysisRequest):
+async def analyze_movement(request: MoveNetAnalysisRequest):
     """Analyze MoveNet keypoints for specific test"""
     if request.session_id not in agents:
         raise HTTPException(status_code=404, detail="Session not found")
     
     try:
-        results = agents[request.session_id].analyze_movenet_results(
-            request.test_id, 
-            request.keypoints
+        if request.keypoints_b64:
+            keypoints = np.frombuffer(
+                base64.b64decode(request.keypoints_b64), dtype=np.float32
+            ).reshape(-1, 3)
+        else:
+            keypoints = request.keypoints
+        # Run the CPU-bound analysis in the threadpool so concurrent
+        # requests don't serialize on the event loop
+        results = await asyncio.get_running_loop().run_in_executor(
+            None,
+            agents[request.session_id].analyze_movenet_results,
+            request.test_id,
+            keypoints
         )
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate_routine")
-def generate_routine(request: GenerateRoutineRequest):
+async def generate_routine(request: GenerateRoutineRequest):
     """Generate personalized routine based on assessment"""
     if request.session_id not in agents:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -100,17 +137,18 @@ def generate_routine(request: GenerateRoutineRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/test_details/{test_id}")
-def get_test_details(test_id: str):
+async def get_test_details(test_id: str, if_none_match: Optional[str] = Header(None)):
     """Get details for specific test including YouTube link"""
     try:
-        area, test_type = test_id.split('_', 1)
-        test_info = MOBILITY_TESTS[area][test_type]
-        return {
-            "test_id": test_id,
-            "details": test_info
-        }
-    except Exception as e:
+        details = TEST_INFO[test_id]
+    except KeyError:
         raise HTTPException(status_code=404, detail="Test not found")
+    if if_none_match == _TESTS_ETAG:
+        return Response(status_code=304)
+    return ORJSONResponse(
+        {"test_id": test_id, "details": details},
+        headers=_STATIC_CACHE_HEADERS
+    )
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -108,4 +108,13 @@ MOBILITY_TESTS = {
             "check_points": ["heel_lift", "knee_valgus", "arm_fall", "forward_lean"]
         }
     }
+}
+
+# Flat test_id -> test info lookup built once, so callers resolve
+# "area_test" ids with a single dict hit instead of split + two-level
+# indexing into MOBILITY_TESTS.
+TEST_INFO = {
+    f"{area}_{test_type}": info
+    for area, tests in MOBILITY_TESTS.items()
+    for test_type, info in tests.items()
 }
\ No newline at end of file
@@ -1,10 +1,38 @@
+from collections import namedtuple
+from math import atan2, degrees
 from typing import Dict, List, Tuple
 import numpy as np
 
+# Row indices into the (17, 3) keypoint array used by the scalar kernels
+_LEFT_EAR = 3
+_LEFT_SHOULDER = 5
+_LEFT_ELBOW = 7
+_LEFT_WRIST = 9
+_LEFT_HIP = 11
+_LEFT_KNEE = 13
+_LEFT_ANKLE = 15
+
+# Squat depth codes emitted by _squat_kernel
+_DEPTH_LABELS = ("Above parallel", "Parallel", "Below parallel")
+
+# Everything _squat_kernel derives from one keypoint set ("pass" is a
+# keyword, hence "passed")
+SquatResult = namedtuple(
+    "SquatResult",
+    "heel_lift knee_valgus arm_fall forward_lean depth passed"
+)
+
 class MoveNetAnalyzer:
-    """Analyzes MoveNet keypoints for mobility tests"""
-    
-    # MoveNet keypoint indices
+    """Analyzes MoveNet keypoints for mobility tests
+
+    All analyze_* methods take a float32 array of shape (17, 3) with
+    columns (x, y, score) -- one row per keypoint -- instead of the raw
+    list-of-dicts payload. The numeric work lives in module-level scalar
+    kernels; the methods are thin adapters that map kernel outputs onto
+    the result dicts the agent expects.
+    """
+
+    # MoveNet keypoint indices (rows of the keypoint array)
     KEYPOINTS = {
         'nose': 0,
         'left_eye': 1,
@@ -24,148 +52,155 @@ class MoveNetAnalyzer:
         'left_ankle': 15,
         'right_ankle': 16
     }
-    
+
+    @staticmethod
+    def keypoints_to_array(keypoints: List[Dict]) -> np.ndarray:
+        """Convert list-of-dict keypoints to a float32 (17, 3) array
+
+        Validation is fused into the conversion: a keypoint missing x or
+        y raises KeyError (or TypeError for malformed entries) from
+        inside the single np.fromiter pass; score defaults to 1.0.
+        """
+        return np.fromiter(
+            (v for kp in keypoints for v in (kp['x'], kp['y'], kp.get('score', 1.0))),
+            dtype=np.float32,
+            count=len(keypoints) * 3
+        ).reshape(-1, 3)
+
     @staticmethod
     def calculate_angle(p1: Tuple[float, float], p2: Tuple[float, float], p3: Tuple[float, float]) -> float:
         """Calculate angle between three points"""
-        # Vector from p2 to p1
-        v1 = np.array([p1[0] - p2[0], p1[1] - p2[1]])
-        # Vector from p2 to p3
-        v2 = np.array([p3[0] - p2[0], p3[1] - p2[1]])
-        
-        # Calculate angle
-        cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-        angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))
-        
-        return np.degrees(angle)
-    
-    def analyze_shoulder_flexion(self, keypoints: List[Dict]) -> Dict:
+        return _angle(p1[0], p1[1], p2[0], p2[1], p3[0], p3[1])
+
+    def analyze_shoulder_flexion(self, arr: np.ndarray) -> Dict:
         """Analyze shoulder flexion from keypoints"""
-        left_shoulder = keypoints[self.KEYPOINTS['left_shoulder']]
-        left_elbow = keypoints[self.KEYPOINTS['left_elbow']]
-        left_wrist = keypoints[self.KEYPOINTS['left_wrist']]
-        left_hip = keypoints[self.KEYPOINTS['left_hip']]
-        
-        # Calculate angle between hip-shoulder-wrist
-        angle = self.calculate_angle(
-            (left_hip['x'], left_hip['y']),
-            (left_shoulder['x'], left_shoulder['y']),
-            (left_wrist['x'], left_wrist['y'])
-        )
-        
+        angle, shrug, elbow_bend = _shoulder_flexion_kernel(arr)
+
+        compensations = []
+        if shrug:
+            compensations.append("Shoulder shrugging detected")
+        if elbow_bend:
+            compensations.append("Elbow bending detected")
+
         return {
             "angle": angle,
             "pass": angle >= 170,
-            "compensation": self._check_shoulder_compensation(keypoints)
+            "compensation": compensations
         }
-    
-    def analyze_hip_internal_rotation(self, keypoints: List[Dict]) -> Dict:
+
+    def analyze_hip_internal_rotation(self, arr: np.ndarray) -> Dict:
         """Analyze hip internal rotation"""
-        hip = keypoints[self.KEYPOINTS['left_hip']]
-        knee = keypoints[self.KEYPOINTS['left_knee']]
-        ankle = keypoints[self.KEYPOINTS['left_ankle']]
-        
-        # Calculate angle of lower leg relative to vertical
-        angle = self.calculate_angle(
-            (knee['x'], knee['y'] - 0.1),  # Point above knee (vertical reference)
-            (knee['x'], knee['y']),
-            (ankle['x'], ankle['y'])
-        )
-        
+        angle = _hip_ir_kernel(arr)
+
         return {
             "angle": angle,
             "pass": angle >= 35,
             "details": "Normal range: 35-45 degrees"
         }
-    
-    def analyze_overhead_squat(self, keypoints: List[Dict]) -> Dict:
+
+    def analyze_overhead_squat(self, arr: np.ndarray) -> Dict:
         """Comprehensive overhead squat analysis"""
-        results = {
-            "heel_lift": self._check_heel_lift(keypoints),
-            "knee_valgus": self._check_knee_valgus(keypoints),
-            "arm_fall": self._check_arm_fall(keypoints),
-            "forward_lean": self._check_forward_lean(keypoints),
-            "depth": self._check_squat_depth(keypoints)
+        result = _squat_kernel(arr)
+
+        return {
+            "heel_lift": result.heel_lift,
+            "knee_valgus": result.knee_valgus,
+            "arm_fall": result.arm_fall,
+            "forward_lean": result.forward_lean,
+            "depth": result.depth,
+            "pass": result.passed
         }
-        
-        # Overall pass if no major compensations
-        results["pass"] = not any([
-            results["heel_lift"],
-            results["knee_valgus"],
-            results["arm_fall"],
-            results["forward_lean"]
-        ])
-        
-        return results
-    
-    def _check_heel_lift(self, keypoints: List[Dict]) -> bool:
-        """Check if heels are lifting during squat"""
-        # Simplified check - in practice would track ankle position over time
-        ankle = keypoints[self.KEYPOINTS['left_ankle']]
-        # Check if ankle confidence is low (might indicate heel lift)
-        return ankle.get('score', 1.0) < 0.5
-    
-    def _check_knee_valgus(self, keypoints: List[Dict]) -> bool:
-        """Check for knee caving inward"""
-        left_hip = keypoints[self.KEYPOINTS['left_hip']]
-        left_knee = keypoints[self.KEYPOINTS['left_knee']]
-        left_ankle = keypoints[self.KEYPOINTS['left_ankle']]
-        
-        # Check if knee is medial to ankle-hip line
-        expected_knee_x = left_ankle['x'] + (left_hip['x'] - left_ankle['x']) * 0.5
-        return abs(left_knee['x'] - expected_knee_x) > 0.05  # 5% threshold
-    
-    def _check_arm_fall(self, keypoints: List[Dict]) -> bool:
-        """Check if arms fall forward during squat"""
-        shoulder = keypoints[self.KEYPOINTS['left_shoulder']]
-        wrist = keypoints[self.KEYPOINTS['left_wrist']]
-        
-        # Arms should stay relatively overhead
-        return wrist['y'] > shoulder['y'] - 0.1
-    
-    def _check_forward_lean(self, keypoints: List[Dict]) -> bool:
-        """Check for excessive forward lean"""
-        shoulder = keypoints[self.KEYPOINTS['left_shoulder']]
-        hip = keypoints[self.KEYPOINTS['left_hip']]
-        ankle = keypoints[self.KEYPOINTS['left_ankle']]
-        
-        # Check if shoulder is too far forward of ankle
-        return shoulder['x'] > ankle['x'] + 0.15
-    
-    def _check_squat_depth(self, keypoints: List[Dict]) -> str:
-        """Check squat depth"""
-        hip = keypoints[self.KEYPOINTS['left_hip']]
-        knee = keypoints[self.KEYPOINTS['left_knee']]
-        
-        if hip['y'] > knee['y']:
-            return "Above parallel"
-        elif hip['y'] > knee['y'] - 0.05:
-            return "Parallel"
-        else:
-            return "Below parallel"
-    
-    def _check_shoulder_compensation(self, keypoints: List[Dict]) -> List[str]:
-        """Check for shoulder compensations"""
-        compensations = []
-        
-        # Check for shoulder shrug
-        shoulder = keypoints[self.KEYPOINTS['left_shoulder']]
-        ear = keypoints[self.KEYPOINTS['left_ear']]
-        if shoulder['y'] < ear['y'] + 0.1:
-            compensations.append("Shoulder shrugging detected")
-        
-        # Check for elbow bend
-        shoulder = keypoints[self.KEYPOINTS['left_shoulder']]
-        elbow = keypoints[self.KEYPOINTS['left_elbow']]
-        wrist = keypoints[self.KEYPOINTS['left_wrist']]
-        
-        elbow_angle = self.calculate_angle(
-            (shoulder['x'], shoulder['y']),
-            (elbow['x'], elbow['y']),
-            (wrist['x'], wrist['y'])
-        )
-        
-        if elbow_angle < 170:
-            compensations.append("Elbow bending detected")
-        
-        return compensations
\ No newline at end of file
+
+
+# Scalar kernels. Plain functions over the (17, 3) array so they carry no
+# self/dict overhead; their signatures are numba.njit-compatible should
+# profiling ever justify adding that dependency.
+
+def _angle(p1x: float, p1y: float, p2x: float, p2y: float, p3x: float, p3y: float) -> float:
+    """Angle at (p2x, p2y) between the two points, in degrees"""
+    # Vector from p2 to p1
+    v1x, v1y = p1x - p2x, p1y - p2y
+    # Vector from p2 to p3
+    v2x, v2y = p3x - p2x, p3y - p2y
+
+    # atan2 of cross/dot is numerically stabler than acos of a
+    # clipped dot product and needs no array allocations
+    return abs(degrees(atan2(v1x * v2y - v1y * v2x, v1x * v2x + v1y * v2y)))
+
+
+def _shoulder_flexion_kernel(arr: np.ndarray) -> Tuple[float, bool, bool]:
+    """Shoulder flexion angle plus shrug/elbow-bend compensation flags"""
+    shoulder_x = float(arr[_LEFT_SHOULDER, 0])
+    shoulder_y = float(arr[_LEFT_SHOULDER, 1])
+    elbow_x = float(arr[_LEFT_ELBOW, 0])
+    elbow_y = float(arr[_LEFT_ELBOW, 1])
+    wrist_x = float(arr[_LEFT_WRIST, 0])
+    wrist_y = float(arr[_LEFT_WRIST, 1])
+    hip_x = float(arr[_LEFT_HIP, 0])
+    hip_y = float(arr[_LEFT_HIP, 1])
+    ear_y = float(arr[_LEFT_EAR, 1])
+
+    # Angle between hip-shoulder-wrist
+    angle = _angle(hip_x, hip_y, shoulder_x, shoulder_y, wrist_x, wrist_y)
+
+    # Shoulder shrug: shoulder riding up toward the ear
+    shrug = shoulder_y < ear_y + 0.1
+
+    # Elbow bend: arm not held straight
+    elbow_angle = _angle(shoulder_x, shoulder_y, elbow_x, elbow_y, wrist_x, wrist_y)
+    elbow_bend = elbow_angle < 170
+
+    return angle, shrug, elbow_bend
+
+
+def _hip_ir_kernel(arr: np.ndarray) -> float:
+    """Lower-leg angle relative to vertical for hip internal rotation"""
+    knee_x = float(arr[_LEFT_KNEE, 0])
+    knee_y = float(arr[_LEFT_KNEE, 1])
+    ankle_x = float(arr[_LEFT_ANKLE, 0])
+    ankle_y = float(arr[_LEFT_ANKLE, 1])
+
+    # Point above the knee gives the vertical reference
+    return _angle(knee_x, knee_y - 0.1, knee_x, knee_y, ankle_x, ankle_y)
+
+
+def _squat_kernel(arr: np.ndarray) -> SquatResult:
+    """All overhead-squat checks in one pass over the keypoint array"""
+    shoulder_x = float(arr[_LEFT_SHOULDER, 0])
+    shoulder_y = float(arr[_LEFT_SHOULDER, 1])
+    wrist_y = float(arr[_LEFT_WRIST, 1])
+    hip_x = float(arr[_LEFT_HIP, 0])
+    hip_y = float(arr[_LEFT_HIP, 1])
+    knee_x = float(arr[_LEFT_KNEE, 0])
+    knee_y = float(arr[_LEFT_KNEE, 1])
+    ankle_x = float(arr[_LEFT_ANKLE, 0])
+    ankle_score = float(arr[_LEFT_ANKLE, 2])
+
+    # Heel lift: low ankle confidence is the simplified proxy
+    heel_lift = ankle_score < 0.5
+
+    # Knee valgus: knee medial to the ankle-hip line (5% threshold)
+    expected_knee_x = ankle_x + (hip_x - ankle_x) * 0.5
+    knee_valgus = abs(knee_x - expected_knee_x) > 0.05
+
+    # Arm fall: arms should stay relatively overhead
+    arm_fall = wrist_y > shoulder_y - 0.1
+
+    # Forward lean: shoulder too far forward of ankle
+    forward_lean = shoulder_x > ankle_x + 0.15
+
+    # Squat depth relative to the knee
+    if hip_y > knee_y:
+        depth_code = 0  # Above parallel
+    elif hip_y > knee_y - 0.05:
+        depth_code = 1  # Parallel
+    else:
+        depth_code = 2  # Below parallel
+
+    # Overall pass if no major compensations
+    passed = not (heel_lift or knee_valgus or arm_fall or forward_lean)
+
+    return SquatResult(
+        heel_lift, knee_valgus, arm_fall, forward_lean,
+        _DEPTH_LABELS[depth_code], passed
+    )